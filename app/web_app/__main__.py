@@ -3,6 +3,7 @@ Main module of the app
 """
 
 import os
+import sys
 from fastapi import FastAPI
 from web_app.db_manager import lifespan
 from web_app.app_routes import ROUTER
@@ -14,4 +15,5 @@ APP.include_router(ROUTER)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("web_app.__main__:APP", host="0.0.0.0", port=int(
-        os.getenv("APP_PORT", "8000")), log_level="info")
+        os.getenv("APP_PORT", "8000")), log_level="info",
+        loop="uvloop" if sys.platform != "win32" else "auto")
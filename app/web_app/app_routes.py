@@ -8,30 +8,92 @@ Funções:
     login(user: UserLogin, db: AsyncSession = Depends(db)) -> Token:
         Lida com o login do usuário, verificando as credenciais e gerando um token JWT.
 
-    consultar(token: str = Depends()) -> dict:
+    consultar(request: Request, token: str = Depends(),
+              http: ClientSession = Depends(get_http)) -> Response:
         Consulta um recurso protegido usando um token JWT.
 
 Variáveis:
     ROUTER (APIRouter): Roteador FastAPI para manipular as rotas da API.
 """
 
+import asyncio
+from aiohttp import ClientSession
 from passlib.context import CryptContext
-from fastapi import HTTPException, Depends, APIRouter
-from fastapi.responses import HTMLResponse
+from fastapi import HTTPException, Depends, APIRouter, Request
+from fastapi.responses import Response
 from socket import gethostname
+from sqlalchemy import bindparam, lambda_stmt, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from web_app.db_models import User
-from web_app.db_manager import get_database
+from web_app.db_manager import get_database, get_http
 from web_app.app_models import UserCreate, UserLogin, Token
 from web_app.jwt_manager import encode, validate_token
-from web_app.grepolis_data import get_players_data
+from web_app.grepolis_data import GrepolisUnavailableError, get_players_html, \
+    get_players_html_gzip, is_cache_warm
 
-__PWD_CRYPT = CryptContext(schemes=["sha512_crypt"], deprecated="auto")
+# argon2 é o esquema padrão; sha512_crypt é mantido apenas para verificar senhas antigas
+__PWD_CRYPT = CryptContext(schemes=["argon2", "sha512_crypt"], deprecated="auto")
+
+# Consultas pré-construídas, o SQL compilado fica em cache no SQLAlchemy
+# Email e nome são únicos, então no máximo dois usuários podem coincidir; a comparação do
+# email é feita pelo Postgres, com as mesmas regras do CITEXT usadas no WHERE
+__SELECT_REGISTERED = lambda_stmt(lambda: select(
+    (User.email == bindparam("email")).label("mesmo_email")).where(
+    or_(User.email == bindparam("email"), User.nome == bindparam("nome"))).limit(2))
+__SELECT_SENHA = lambda_stmt(lambda: select(User.senha).where(
+    User.email == bindparam("email")).limit(1))
 
 ROUTER = APIRouter()
 
 
+def __accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Checks whether an Accept-Encoding header allows a gzip compressed response.
+    Args:
+        accept_encoding (str): The value of the Accept-Encoding header.
+    Returns:
+        bool: True if gzip, or the "*" wildcard when gzip is not listed, has q > 0.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    # Um valor explícito para gzip tem precedência sobre o "*"
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
+
+
+async def __check_registered(user: UserCreate, db: AsyncSession) -> None:
+    """
+    Checks whether the email or the name of the user is already registered.
+    Args:
+        user (UserCreate): The user information to be registered.
+        db (AsyncSession): The database session.
+    Raises:
+        HTTPException: If the email is already registered.
+        HTTPException: If the username is already taken.
+    """
+    # Email e nome são verificados em uma única consulta
+    registrados = (await db.execute(
+        __SELECT_REGISTERED, {"email": user.email, "nome": user.nome})).scalars().all()
+
+    if any(registrados):
+        raise HTTPException(status_code=400, detail="Email já registrado")
+
+    if registrados:
+        raise HTTPException(status_code=400, detail="Nome indisponível")
+
+
 @ROUTER.post("/registrar", response_model=Token)
 async def registrar(user: UserCreate, db: AsyncSession = Depends(get_database)) -> Token:
     """
@@ -45,16 +107,21 @@ async def registrar(user: UserCreate, db: AsyncSession = Depends(get_database))
     Returns:
         Token: The JWT token for the registered user.
     """
-    if (await db.execute(select(User).where(User.email == user.email))).scalar_one_or_none():
-        raise HTTPException(status_code=400, detail="Email já registrado")
+    await __check_registered(user, db)
 
-    if (await db.execute(select(User).where(User.nome == user.nome))).scalar_one_or_none():
-        raise HTTPException(status_code=400, detail="Nome indisponível")
+    # O hash é custoso em CPU, então é executado fora do event loop
+    senha = await asyncio.get_running_loop().run_in_executor(
+        None, __PWD_CRYPT.hash, user.senha)
 
-    db.add(User(nome=user.nome, email=user.email,
-           senha=__PWD_CRYPT.hash(user.senha)))
+    db.add(User(nome=user.nome, email=user.email, senha=senha))
 
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        # Um cadastro concorrente pode ter usado o mesmo email ou nome após a verificação
+        await db.rollback()
+        await __check_registered(user, db)
+        raise
 
     return Token(jwt=encode(user.email))
 
@@ -71,37 +138,45 @@ async def login(user: UserLogin, db: AsyncSession = Depends(get_database)) -> To
     Raises:
         HTTPException: If the credentials are invalid, raises a 401 HTTP exception.
     """
-    db_user = (await db.execute(select(User).where(User.email == user.email))).scalar_one_or_none()
+    senha = (await db.execute(__SELECT_SENHA, {"email": user.email})).scalar_one_or_none()
 
-    if not db_user or not __PWD_CRYPT.verify(user.senha, db_user.senha):
+    if not senha or not await asyncio.get_running_loop().run_in_executor(
+            None, __PWD_CRYPT.verify, user.senha, senha):
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
 
     return Token(jwt=encode(user.email))
 
 
 @ROUTER.get("/consultar")
-async def consultar(payload: dict = Depends(validate_token)) -> HTMLResponse:  # pylint: disable=unused-argument
+async def consultar(request: Request,
+                    payload: dict = Depends(validate_token),  # pylint: disable=unused-argument
+                    http: ClientSession = Depends(get_http)) -> Response:
     """
     Asynchronous function to validate a token and return a success message.
     Args:
+        request (Request): The current request, used to check the accepted encodings.
         token (str): The token to be validated. This is provided by the Depends() dependency.
+        http (ClientSession): The shared HTTP session used to fetch the Grepolis data.
     Returns:
-        str: Contains the Grepolis player data in HTML format.
+        Response: The Grepolis player data in HTML format, gzip compressed if the client
+        accepts it.
     Raises:
         HTTPException: If the token is invalid, raises a 403 HTTP exception.
+        HTTPException: If the Grepolis data is unavailable, raises a 503 HTTP exception.
     """
+    headers = {"Vary": "Accept-Encoding"}
+
+    try:
+        if __accepts_gzip(request.headers.get("accept-encoding", "")):
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=await get_players_html_gzip(http), media_type="text/html",
+                            headers=headers)
+
+        page = await get_players_html(http)
+    except GrepolisUnavailableError as exc:
+        raise HTTPException(status_code=503, detail="Dados do Grepolis indisponíveis") from exc
 
-    return HTMLResponse(content=f"""
-    <html>
-        <head>
-            <title>Grepolis Player Data</title>
-        </head>
-        <body>
-            <h1>Grepolis Data</h1>
-            {get_players_data().to_html()}
-        </body>
-    </html>
-    """)
+    return Response(content=page, media_type="text/html", headers=headers)
 
 
 @ROUTER.get("/health-check", status_code=200)
@@ -109,6 +184,8 @@ async def health_check():
     """
     Health check endpoint to verify the status of the server.
     Returns:
-        dict: A dictionary containing the hostname of the server.
+        dict: A dictionary containing the hostname of the server and whether the Grepolis
+        data is loaded. The status is always 200, as the other endpoints do not depend on
+        the Grepolis data.
     """
-    return {"server_hostname": gethostname()}
+    return {"server_hostname": gethostname(), "grepolis_data": is_cache_warm()}
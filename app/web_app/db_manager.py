@@ -7,32 +7,104 @@ Funções:
     lifespan() -> AsyncGenerator[None, None]:
         Gerenciador de contexto assíncrono que lida com eventos de ciclo de vida do
         aplicativo FastAPI.
-        Garante que o esquema do banco de dados seja criado no início do aplicativo.
+        Cria o esquema do banco de dados no início do aplicativo quando RUN_CREATE_ALL=1,
+        mantém uma sessão HTTP persistente durante a vida do aplicativo e pré-carrega os
+        dados do Grepolis em segundo plano.
     get_db() -> AsyncGenerator[AsyncSession, None]:
         Gerador assíncrono que fornece uma sessão de banco de dados.
+    get_http() -> ClientSession:
+        Fornece a sessão HTTP compartilhada do aplicativo.
 """
+import asyncio
+import logging
 import os
 from contextlib import asynccontextmanager
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from fastapi import Request
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from web_app.db_models import User, BASE #pylint: disable=unused-import
+from web_app.grepolis_data import GrepolisUnavailableError, get_players_data
+
+# Com o PgBouncer em modo transaction o pool fica a cargo dele, então o pool local é
+# desativado e os prepared statements do asyncpg precisam ser desligados
+if os.getenv("PGBOUNCER", "0") == "1":
+    __ENGINE_OPTIONS = {
+        "poolclass": NullPool,
+        "connect_args": {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    }
+else:
+    # O POOL_SIZE é o total de conexões da implantação, dividido entre os workers do uvicorn
+    __WORKERS = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+    __ENGINE_OPTIONS = {
+        "pool_size": max(int(os.getenv("POOL_SIZE", "20")) // __WORKERS, 1),
+        "max_overflow": int(os.getenv("POOL_MAX_OVERFLOW", "10")),
+        "pool_timeout": 30,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800
+    }
 
 __ENGINE = create_async_engine(f"postgresql+asyncpg://{os.getenv("POSTGRES_USER", "postgres")}:{ \
     os.getenv("POSTGRES_PASSWORD", "password")}@{os.getenv("POSTGRES_HOST", "localhost")}:{ \
-    os.getenv("POSTGRES_PORT", "5432")}/{os.getenv("POSTGRES_DB", "postgres")}")
+    os.getenv("POSTGRES_PORT", "5432")}/{os.getenv("POSTGRES_DB", "postgres")}",
+    echo=False, **__ENGINE_OPTIONS)
+
+__SCHEMA_UPGRADE = [
+    """
+    DO $$ BEGIN
+        IF (SELECT udt_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = 'users'
+                AND column_name = 'email') <> 'citext' THEN
+            ALTER TABLE users ALTER COLUMN email TYPE citext;
+        END IF;
+    END $$
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    # A constraint UNIQUE criada originalmente duplicaria o índice ix_users_email
+    "ALTER TABLE users DROP CONSTRAINT IF EXISTS users_email_key",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_nome ON users (nome)"
+]
 
 __SESSION = sessionmaker(__ENGINE, class_=AsyncSession, expire_on_commit=False)
 
 
+async def __warm_up(http: ClientSession) -> None:
+    """
+    Loads the Grepolis data into its cache, retrying with exponential backoff until it
+    succeeds.
+
+    Args:
+        http (ClientSession): The HTTP session used to download the data.
+    """
+    # O cache só tenta um novo download após 60 segundos de uma falha
+    delay = 60
+    while True:
+        try:
+            await get_players_data(http)
+            return
+        except GrepolisUnavailableError:
+            logging.getLogger(__name__).warning(
+                "Dados do Grepolis indisponíveis, nova tentativa em %d segundos", delay)
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 600)
+
+
 @asynccontextmanager
-async def lifespan(app): # pylint: disable=unused-argument
+async def lifespan(app):
     """
     Lifespan event handler for the FastAPI application.
 
     This function is an asynchronous context manager that handles the lifespan
-    events of the FastAPI application. It ensures that the database schema is
-    created at the start of the application by running the `create_all` method
-    on the SQLAlchemy metadata.
+    events of the FastAPI application. When the RUN_CREATE_ALL environment variable
+    is "1", it creates the database schema at the start of the application by
+    running the `create_all` method on the SQLAlchemy metadata and upgrading an
+    existing `users` table to the current column types and indexes. It also keeps a
+    single keep-alive HTTP session in `app.state.http`, which is closed on shutdown,
+    and starts loading the Grepolis data in the background, retrying until it
+    succeeds, so the first request does not pay for it.
 
     Args:
         app (FastAPI): The FastAPI application instance.
@@ -40,9 +112,26 @@ async def lifespan(app): # pylint: disable=unused-argument
     Yields:
         None
     """
-    async with __ENGINE.begin() as conn:
-        await conn.run_sync(BASE.metadata.create_all)
-    yield
+    # Com vários workers, apenas um deve executar o DDL
+    if os.getenv("RUN_CREATE_ALL") == "1":
+        async with __ENGINE.begin() as conn:
+            # Necessária para a coluna CITEXT de User.email
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS citext"))
+            await conn.run_sync(BASE.metadata.create_all)
+            # create_all não altera tabelas existentes, então bancos criados antes do CITEXT
+            # e dos índices de User são atualizados aqui
+            for statement in __SCHEMA_UPGRADE:
+                await conn.execute(text(statement))
+
+    # Limita a espera por uma atualização dos dados do Grepolis durante uma indisponibilidade
+    app.state.http = ClientSession(connector=TCPConnector(limit=16, keepalive_timeout=75),
+                                   timeout=ClientTimeout(total=30, connect=5))
+    warm_up = asyncio.create_task(__warm_up(app.state.http))
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        await app.state.http.close()
 
 
 async def get_database():
@@ -54,3 +143,16 @@ async def get_database():
     """
     async with __SESSION() as session:
         yield session
+
+
+def get_http(request: Request) -> ClientSession:
+    """
+    Provides the HTTP session shared by the application.
+
+    Args:
+        request (Request): The current request.
+
+    Returns:
+        ClientSession: The HTTP session created in the lifespan handler.
+    """
+    return request.app.state.http
@@ -6,21 +6,66 @@ The module contains the following functions:
     returning a DataFrame with the following columns:
     id, name, alliance_id, points, rank, towns, combat_rank, combat_points, attack_rank,
       attack_points, defense_rank, defense_points.
+    get_players_html: Returns the player data rendered as an UTF-8 encoded HTML page.
+    get_players_html_gzip: Returns the same HTML page compressed with gzip.
+    is_cache_warm: Returns whether the player data has already been loaded.
+
+The data is cached in memory for __CACHE_TTL seconds, as Grepolis only updates it hourly.
+If a refresh fails, the previous data keeps being served and a new attempt is only made
+after __CACHE_RETRY seconds.
 """
-from urllib.parse import unquote_plus
+import asyncio
+import gzip
+import io
+import logging
+import time
+from urllib.parse import unquote
+from aiohttp import ClientSession
 from pandas import DataFrame
 import pandas as pd
 
 __GAME_WORLD = "br137"
 __COMBAT_COLUMNS = ["rank", "player_id", "points"]
-__COMBAT_DYPES = {"rank": int, "player_id": int, "points": int}
+# Ranks, IDs e pontos cabem em int32, o que reduz pela metade a memória e o custo dos merges
+__COMBAT_DYPES = {"rank": "int32", "player_id": "int32", "points": "int32"}
+__COMBAT_KINDS = ["combat", "attack", "defense"]
+
+__CACHE_TTL = 600
+__CACHE_RETRY = 60
+__CACHE = {"df": None, "html": None, "gzip": None, "ts": float("-inf"),
+           "lock": asyncio.Lock()}
+
+__HTML_HEAD = b"""
+    <html>
+        <head>
+            <title>Grepolis Player Data</title>
+        </head>
+        <body>
+            <h1>Grepolis Data</h1>
+            """
+__HTML_TAIL = b"""
+        </body>
+    </html>
+    """
 
 
-def __read_data(url: str, columns: list[str], dtype: dict[str, any]) -> DataFrame:
+class GrepolisUnavailableError(RuntimeError):
+    """
+    Raised when the Grepolis data could not be loaded and there is no cached data to serve.
+    """
+
+
+async def __read_data(session: ClientSession, url: str, columns: list[str],
+                      dtype: dict[str, any]) -> DataFrame:
     """
     Reads data from a CSV file at the given URL with specified columns and data types.
 
+    The download is done asynchronously and the decompression and parsing run in a worker
+    thread, so the event loop is never blocked. The CSV is parsed by the multi-threaded
+    pyarrow engine.
+
     Args:
+        session (ClientSession): The HTTP session used to download the file.
         url (str): The URL of the CSV file to read.
         columns (list[str]): A list of column names to use for the DataFrame.
         dtype (dict[str, any]): A dictionary specifying the data type for each column.
@@ -28,12 +73,19 @@ def __read_data(url: str, columns: list[str], dtype: dict[str, any]) -> DataFram
     Returns:
         DataFrame: A pandas DataFrame containing the data from the CSV file.
     """
-    return pd.read_csv(url, compression="gzip", sep=",", names=columns, dtype=dtype)
+    async with session.get(url) as response:
+        response.raise_for_status()
+        data = await response.read()
+
+    return await asyncio.to_thread(pd.read_csv, io.BytesIO(data), compression="gzip",
+                                   sep=",", names=columns, dtype=dtype, engine="pyarrow")
 
 
-def __player_data() -> DataFrame:
+async def __player_data(session: ClientSession) -> DataFrame:
     """
     Fetches and processes player data from the specified Grepolis game world.
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
     Returns:
         DataFrame: A pandas DataFrame containing player data with the following columns:
             - id (int): The player's ID.
@@ -43,70 +95,192 @@ def __player_data() -> DataFrame:
             - rank (int): The player's rank.
             - towns (int): The number of towns the player has.
     """
-    data = __read_data(
+    data = await __read_data(
+        session,
         f"http://{__GAME_WORLD}.grepolis.com/data/players.txt.gz",
         ["id", "name", "alliance_id", "points", "rank", "towns"],
-        {"id": int, "name": str, "alliance_id": float,
-            "points": int, "rank": int, "towns": int}
+        {"id": "int32", "name": str, "alliance_id": "Int32",
+            "points": "int32", "rank": "int32", "towns": "int32"}
     )
-    data['name'] = data['name'].apply(unquote_plus)
-    data['alliance_id'] = data['alliance_id'].fillna(-1).astype(int)
+    # A troca de "+" é vetorizada, restando apenas o unquote por nome
+    data['name'] = [unquote(name) for name in
+                    data['name'].str.replace("+", " ", regex=False).to_numpy()]
+    data['alliance_id'] = data['alliance_id'].fillna(-1)
 
     return data
 
 
-def __player_combat_data() -> DataFrame:
+async def __player_combat_data(session: ClientSession) -> DataFrame:
     """
     Fetches and processes player combat data from the Grepolis game world.
 
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+
     Returns:
-        DataFrame: A pandas DataFrame containing the player combat data with columns renamed 
-        to 'combat_rank' and 'combat_points'.
+        DataFrame: A pandas DataFrame containing the player combat data, tagged with
+        kind 'combat'.
     """
-    return __read_data(
+    return (await __read_data(
+        session,
         f"http://{__GAME_WORLD}.grepolis.com/data/player_kills_all.txt.gz",
         __COMBAT_COLUMNS,
         __COMBAT_DYPES
-    ).rename(columns={"rank": "combat_rank", "points": "combat_points"})
+    )).assign(kind="combat")
 
 
-def __player_attack_data() -> DataFrame:
+async def __player_attack_data(session: ClientSession) -> DataFrame:
     """
     Fetches and processes player attack data from the Grepolis game world.
 
-    This function reads player attack data from a specified URL, processes it,
-    and renames certain columns for clarity.
+    This function reads player attack data from a specified URL and tags it
+    with its kind, so it can be combined with the other combat data.
+
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
 
     Returns:
-        DataFrame: A pandas DataFrame containing the processed player attack data
-        with columns renamed to "attack_rank" and "attack_points".
+        DataFrame: A pandas DataFrame containing the processed player attack data,
+        tagged with kind "attack".
     """
-    return __read_data(
+    return (await __read_data(
+        session,
         f"http://{__GAME_WORLD}.grepolis.com/data/player_kills_att.txt.gz",
         __COMBAT_COLUMNS,
         __COMBAT_DYPES
-    ).rename(columns={"rank": "attack_rank", "points": "attack_points"})
+    )).assign(kind="attack")
 
 
-def __player_defense_data() -> DataFrame:
+async def __player_defense_data(session: ClientSession) -> DataFrame:
     """
     Fetches and processes player defense data from the Grepolis game world.
 
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+
     Returns:
-        DataFrame: A pandas DataFrame containing the player defense data with columns
-        renamed to "defense_rank" and "defense_points".
+        DataFrame: A pandas DataFrame containing the player defense data, tagged
+        with kind "defense".
     """
-    return __read_data(
+    return (await __read_data(
+        session,
         f"http://{__GAME_WORLD}.grepolis.com/data/player_kills_def.txt.gz",
         __COMBAT_COLUMNS,
         __COMBAT_DYPES
-    ).rename(columns={"rank": "defense_rank", "points": "defense_points"})
+    )).assign(kind="defense")
 
 
-def get_players_data() -> DataFrame:
+async def __merge_players_data(session: ClientSession) -> DataFrame:
     """
     Retrieve and merge the player data, combat, attack, and defense into a single DataFrame.
 
+    The four files are downloaded concurrently. The three combat files are stacked and
+    pivoted to one row per player, so a single merge against the player data is needed.
+
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+
+    Returns:
+        DataFrame: A DataFrame containing merged player data, sorted by rank.
+    """
+    players, *combat = await asyncio.gather(
+        __player_data(session),
+        __player_combat_data(session),
+        __player_attack_data(session),
+        __player_defense_data(session)
+    )
+
+    combat = pd.concat(combat, ignore_index=True).pivot(
+        index="player_id", columns="kind", values=["rank", "points"])
+    combat.columns = [f"{kind}_{value}" for value, kind in combat.columns]
+
+    return players.merge(
+        combat.reindex(columns=[f"{kind}_{value}" for kind in __COMBAT_KINDS
+                                for value in ("rank", "points")]),
+        left_on="id",
+        right_index=True,
+        how="left"
+    ).sort_values(
+        by='rank'
+    )
+
+
+def __render_html(data: DataFrame) -> tuple[bytes, bytes]:
+    """
+    Renders the player data as an HTML page, both plain and compressed with gzip.
+
+    Args:
+        data (DataFrame): The merged player data.
+
+    Returns:
+        tuple[bytes, bytes]: The UTF-8 encoded HTML page and its gzip compressed version.
+    """
+    page = __HTML_HEAD + data.to_html().encode() + __HTML_TAIL
+    return page, gzip.compress(page, 6)
+
+
+async def __refresh_cache(session: ClientSession) -> None:
+    """
+    Refreshes the cached DataFrame and its HTML renderings if the cache has expired.
+
+    A failed refresh is logged and keeps the previous data, postponing the next attempt
+    by __CACHE_RETRY seconds, so waiting requests do not retry the download one by one.
+
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+    """
+    if time.monotonic() - __CACHE["ts"] < __CACHE_TTL:
+        return
+
+    async with __CACHE["lock"]:
+        # Outra corrotina pode ter atualizado o cache enquanto esta aguardava o lock
+        if time.monotonic() - __CACHE["ts"] < __CACHE_TTL:
+            return
+
+        try:
+            data = await __merge_players_data(session)
+            html, html_gzip = await asyncio.to_thread(__render_html, data)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logging.getLogger(__name__).exception("Falha ao atualizar os dados do Grepolis")
+            __CACHE["ts"] = time.monotonic() - __CACHE_TTL + __CACHE_RETRY
+            return
+
+        __CACHE["df"] = data
+        __CACHE["html"] = html
+        __CACHE["gzip"] = html_gzip
+        __CACHE["ts"] = time.monotonic()
+
+
+async def __cached(session: ClientSession, key: str):
+    """
+    Returns a cached value, refreshing the cache first if it has expired.
+
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+        key (str): The cache entry to return.
+
+    Returns:
+        The cached value for the given key.
+
+    Raises:
+        GrepolisUnavailableError: If the data has never been loaded successfully.
+    """
+    await __refresh_cache(session)
+
+    if __CACHE[key] is None:
+        raise GrepolisUnavailableError("Os dados do Grepolis estão indisponíveis")
+
+    return __CACHE[key]
+
+
+async def get_players_data(session: ClientSession) -> DataFrame:
+    """
+    Retrieve the merged player data, combat, attack, and defense DataFrame, using the
+    in-memory cache when it is still valid.
+
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+
     Columns:
     - id (int): The player's ID.
     - name (str): The player's name, URL-decoded.
@@ -123,26 +297,53 @@ def get_players_data() -> DataFrame:
 
     Returns:
         DataFrame: A DataFrame containing merged player data, sorted by rank.
+
+    Raises:
+        GrepolisUnavailableError: If the data has never been loaded successfully.
     """
-    return __player_data().merge(
-        __player_combat_data(),
-        left_on="id",
-        right_on="player_id",
-        how="left"
-    ).merge(
-        __player_attack_data(),
-        left_on="id",
-        right_on="player_id",
-        how="left",
-        suffixes=("", "_atk")
-    ).merge(
-        __player_defense_data(),
-        left_on="id",
-        right_on="player_id",
-        how="left",
-        suffixes=("", "_def")
-    ).drop(
-        columns=["player_id", "player_id_atk", "player_id_def"]
-    ).sort_values(
-        by='rank'
-    )
+    return await __cached(session, "df")
+
+
+async def get_players_html(session: ClientSession) -> bytes:
+    """
+    Retrieve the player data rendered as an UTF-8 encoded HTML page, using the in-memory
+    cache when it is still valid.
+
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+
+    Returns:
+        bytes: The HTML page with the table produced by DataFrame.to_html for
+        get_players_data.
+
+    Raises:
+        GrepolisUnavailableError: If the data has never been loaded successfully.
+    """
+    return await __cached(session, "html")
+
+
+async def get_players_html_gzip(session: ClientSession) -> bytes:
+    """
+    Retrieve the player data HTML page compressed with gzip, using the in-memory cache
+    when it is still valid. The page is compressed once per refresh.
+
+    Args:
+        session (ClientSession): The HTTP session used to download the data.
+
+    Returns:
+        bytes: The gzip compressed version of get_players_html.
+
+    Raises:
+        GrepolisUnavailableError: If the data has never been loaded successfully.
+    """
+    return await __cached(session, "gzip")
+
+
+def is_cache_warm() -> bool:
+    """
+    Checks whether the player data has already been loaded into the cache.
+
+    Returns:
+        bool: True if the cache holds player data, even if it is due for a refresh.
+    """
+    return __CACHE["df"] is not None
@@ -8,14 +8,20 @@ Functions:
 """
 
 import os
+from hashlib import blake2b
 from datetime import datetime, timedelta, timezone
-from jose import jwt, ExpiredSignatureError, JWTError
-from fastapi import Depends, HTTPException
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from cachetools import TTLCache
+import jwt
+from jwt import ExpiredSignatureError, InvalidTokenError
+from fastapi import Header, HTTPException
 
-__SECURITY = HTTPBearer()
-__JWT_SECRET = os.getenv("JWT_SECRET", "secret")
+# Chave já codificada em bytes, evitando a conversão a cada token
+__JWT_SECRET = os.getenv("JWT_SECRET", "secret").encode()
 __JWT_ALGORITHM = "HS512"
+__JWT_EXPIRATION = timedelta(hours=1)
+
+# Cache dos payloads já validados, indexado pelo digest do token
+__JWT_CACHE = TTLCache(maxsize=10_000, ttl=60)
 
 
 def encode(email: str) -> str:
@@ -27,28 +33,46 @@ def encode(email: str) -> str:
         str: The encoded JWT token as a string.
     """
     return jwt.encode(
-        {"sub": email, "exp": datetime.now(timezone.utc) + timedelta(hours=1)},
+        {"sub": email, "exp": datetime.now(timezone.utc) + __JWT_EXPIRATION},
         __JWT_SECRET,
         algorithm=__JWT_ALGORITHM
     )
 
 
-async def validate_token(
-    credentials: HTTPAuthorizationCredentials = Depends(__SECURITY)
-) -> dict[str, any]:
+async def validate_token(authorization: str | None = Header(None)) -> dict[str, any]:
     """
     Validates the provided JWT token.
     Args:
-        credentials (HTTPAuthorizationCredentials): The HTTP authorization credentials.
+        authorization (str | None): The Authorization header, in the "Bearer <token>" format.
     Returns:
         dict: The decoded token payload if the token is valid.
     Raises:
-        HTTPException: If the token is invalid or expired.
+        HTTPException: If the header is missing, or the token is invalid or expired.
     """
+    scheme, _, token = (authorization or "").partition(" ")
+
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=403, detail="Not authenticated")
+
+    key = blake2b(token.encode(), digest_size=16).digest()
+    payload = __JWT_CACHE.get(key)
+
+    if payload is not None:
+        # O TTL do cache pode ultrapassar a expiração do próprio token
+        if payload["exp"] > datetime.now(timezone.utc).timestamp():
+            return payload
+
+        __JWT_CACHE.pop(key, None)
+        raise HTTPException(status_code=403, detail="Token expirado.")
+
     try:
-        return jwt.decode(credentials.credentials,
-                          __JWT_SECRET, algorithms=[__JWT_ALGORITHM])
+        payload = jwt.decode(token, __JWT_SECRET,
+                             algorithms=[__JWT_ALGORITHM],
+                             options={"require": ["exp", "sub"], "verify_aud": False})
     except ExpiredSignatureError as exc:
         raise HTTPException(status_code=403, detail="Token expirado.") from exc
-    except JWTError as exc:
+    except InvalidTokenError as exc:
         raise HTTPException(status_code=403, detail="Token inválido.") from exc
+
+    __JWT_CACHE[key] = payload
+    return payload